@@ -73,13 +73,28 @@ def analyze_by_wh_group(annot_df: pd.DataFrame,
     return analyze_by_column_value(annot_df, column=grouping_column, analysis_func=analysis_func)
 
 
-def print_annot_statistics(annot_df: pd.DataFrame):
+def get_role_distribution(annot_df: pd.DataFrame) -> Counter:
+    """ Return distribution of #-roles (i.e. non-NA questions) per assignment (predicate X worker). """
+    n_roles_per_assignment = annot_df.groupby(['key', 'worker_id'], observed=True).question.count()
+    return Counter(n_roles_per_assignment.value_counts().sort_index().to_dict())
+
+
+def get_role_distribution_per_worker(annot_df: pd.DataFrame) -> Dict[str, Counter]:
+    """ Return `get_role_distribution` of each worker's questions, computed in a single groupby pass. """
+    annot_with_questions_df = filter_questions(annot_df)
+    n_roles_per_assignment = annot_with_questions_df.groupby(['worker_id', 'key'], observed=True).question.count()
+    return {worker: Counter(worker_n_roles.value_counts().sort_index().to_dict())
+            for worker, worker_n_roles in n_roles_per_assignment.groupby(level='worker_id', observed=True)}
+
+
+def print_annot_statistics(annot_df: pd.DataFrame, roleDist: Optional[Counter] = None):
+    """ `roleDist` (distribution of #-roles per assignment) is computed from `annot_df` unless given. """
     n_assignments = get_n_assignments(annot_df)
     n_predicates = get_n_predicates(annot_df)
     n_positive_predicates = get_n_positive_predicates(annot_df)
     n_qas = get_n_QAs(annot_df)
-    annot_with_questions_df = filter_questions(annot_df)
-    roleDist = Counter(annot_with_questions_df.groupby(['key','worker_id']).agg(pd.Series.count)['question'])
+    if roleDist is None:
+        roleDist = get_role_distribution(filter_questions(annot_df))
     sum_roles = sum(k * v for k, v in roleDist.items())
     num_roles_average = sum_roles / float(n_assignments)
     num_positive_wo_qas = roleDist[0]
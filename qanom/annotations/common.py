@@ -42,6 +42,51 @@ def read_annot_csv(file_path: str) -> pd.DataFrame:
     return decode_qasrl(df)
 
 
+# version of the pickled annotation DataFrames written by `load_annotations` - bump when their format changes
+CACHE_VERSION = 1
+
+
+def load_annotations(annotation_path: str, use_cache: bool = False) -> pd.DataFrame:
+    """
+    Read and decode an annotation CSV, with compact dtypes for evaluation
+    (see `set_categorical_columns` and `downcast_int_columns`).
+    When `use_cache`, the resulting DataFrame is pickled next to the CSV (as `<annotation_path>.v<CACHE_VERSION>.pkl`),
+    and is re-used as long as the CSV is not modified afterwards; cache files of other versions are removed.
+    Only enable it for annotation files you trust, as loading the cache unpickles it.
+    """
+    import os
+    cache_path = f"{annotation_path}.v{CACHE_VERSION}.pkl"
+    if use_cache and os.path.exists(cache_path) \
+            and os.path.getmtime(cache_path) >= os.path.getmtime(annotation_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception as e:
+            print(f"Warning: could not load cached annotations from {cache_path} ({e!r}); re-reading CSV.")
+    annot_df = downcast_int_columns(set_categorical_columns(read_annot_csv(annotation_path)))
+    if use_cache:
+        _remove_superseded_caches(annotation_path, keep=cache_path)
+        try:
+            annot_df.to_pickle(cache_path)
+        except OSError as e:
+            print(f"Warning: could not cache annotations to {cache_path}: {e}")
+    return annot_df
+
+
+def _remove_superseded_caches(annotation_path: str, keep: str) -> NoReturn:
+    """ Remove cache files of `annotation_path` written by other versions of `load_annotations`
+    (`<annotation_path>.pkl`, `<annotation_path>.<hash-tag>.pkl` and `<annotation_path>.v<N>.pkl`). """
+    import glob
+    import os
+    import re
+    cache_name = re.compile(re.escape(os.path.basename(annotation_path)) + r"(\.[0-9a-f]{10}|\.v\d+)?\.pkl")
+    for path in glob.glob(glob.escape(annotation_path) + "*.pkl"):
+        if path != keep and cache_name.fullmatch(os.path.basename(path)):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Warning: could not remove superseded cache {path}: {e}")
+
+
 def save_annot_csv(annot_df: pd.DataFrame, file_path: str) -> NoReturn:
     from qanom.annotations.decode_encode_answers import encode_qasrl
     df = encode_qasrl(annot_df)
@@ -80,7 +125,23 @@ def set_key_column(annot_df: pd.DataFrame):
     """ Add 'key' column (predicate unique identifier) """
     pred_idx_label = get_predicate_idx_label(annot_df)
     if 'key' not in annot_df.columns and len(annot_df):
-        annot_df['key'] = annot_df.apply(lambda r: r['qasrl_id']+"_"+str(r[pred_idx_label]), axis=1)
+        annot_df['key'] = annot_df['qasrl_id'].astype(str) + "_" + annot_df[pred_idx_label].astype(str)
+
+
+def set_categorical_columns(annot_df: pd.DataFrame) -> pd.DataFrame:
+    """ Cast the identifier columns (worker, sentence-id and predicate string) to 'category' dtype.
+     Note: when grouping by these columns, pass `observed=True` to skip unobserved categories. """
+    for col in {'worker_id', 'qasrl_id', 'verb', 'noun'} & set(annot_df.columns):
+        annot_df[col] = annot_df[col].astype('category')
+    return annot_df
+
+
+def downcast_int_columns(annot_df: pd.DataFrame) -> pd.DataFrame:
+    """ Downcast integer columns (e.g. the predicate index) to the smallest integer dtype holding their values. """
+    for col in annot_df.select_dtypes(include='integer').columns:
+        downcast = 'unsigned' if (annot_df[col] >= 0).all() else 'integer'
+        annot_df[col] = pd.to_numeric(annot_df[col], downcast=downcast)
+    return annot_df
 
 
 def set_sentence_columns(annot_df: pd.DataFrame, sentence_df: pd.DataFrame) -> NoReturn:
@@ -90,31 +151,68 @@ def set_sentence_columns(annot_df: pd.DataFrame, sentence_df: pd.DataFrame) -> N
 
 
 def get_sent_map(annot_df: pd.DataFrame) -> Dict[str, List[str]]:
-    sent_map = dict(zip(annot_df.qasrl_id, annot_df.sentence.apply(str.split)))
+    # split each sentence once (as in `dict`, the last occurrence of a qasrl_id determines its sentence)
+    sent_df = annot_df.drop_duplicates(subset='qasrl_id', keep='last')
+    sent_map = dict(zip(sent_df.qasrl_id, sent_df.sentence.str.split().to_list()))
     return sent_map
 
 
+def _count_per_group(group_codes: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """ For each row, count the `mask`-ed rows sharing its group code. Rows with a negative code (no group) get 0. """
+    has_group = group_codes >= 0
+    counts = np.bincount(group_codes[has_group], weights=mask[has_group], minlength=1).astype(np.int64)
+    return np.where(has_group, counts[np.maximum(group_codes, 0)], 0)
+
+
+def _get_predicate_and_assignment_codes(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return, for each row, an integer code of its predicate ('key'; -1 for NA key),
+    and of its assignment (predicate X worker; -1 for NA key or worker) - using a single hashing pass per column. """
+    key_codes, _ = pd.factorize(df['key'])
+    worker_codes, worker_uniques = pd.factorize(df['worker_id'])
+    is_assigned = (key_codes >= 0) & (worker_codes >= 0)
+    # encode (predicate, worker) as a single integer, then compact into consecutive assignment codes
+    pairs = key_codes.astype(np.int64) * max(len(worker_uniques), 1) + worker_codes
+    assignment_codes = np.full(len(df), -1, dtype=np.int64)
+    assignment_codes[is_assigned] = np.unique(pairs[is_assigned], return_inverse=True)[1].reshape(-1)
+    return key_codes, assignment_codes
+
+
+def _set_n_workers(df: pd.DataFrame, key_codes: np.ndarray, assignment_codes: np.ndarray):
+    # per predicate - number of distinct assignments (NA workers are not counted, as in `nunique`).
+    # Rows with NA key belong to no predicate, and get 0.
+    is_assigned = assignment_codes >= 0
+    assignment_key_codes = np.zeros(assignment_codes.max(initial=-1) + 1, dtype=np.int64)
+    assignment_key_codes[assignment_codes[is_assigned]] = key_codes[is_assigned]
+    n_workers = np.bincount(assignment_key_codes, minlength=key_codes.max(initial=-1) + 1)
+    has_key = key_codes >= 0
+    df['n_workers'] = pd.to_numeric(np.where(has_key, n_workers[np.maximum(key_codes, 0)], 0),
+                                    downcast='unsigned')
+
+
+def _set_n_roles(df: pd.DataFrame, assignment_codes: np.ndarray):
+    # per predicate per worker
+    is_null = df.wh.isnull().to_numpy()
+    df['no_roles'] = _count_per_group(assignment_codes, is_null)
+    num_rows = _count_per_group(assignment_codes, ~is_null)
+    df['n_roles'] = pd.to_numeric(num_rows - df['no_roles'], downcast='integer')
+
+
 def set_n_workers(df: pd.DataFrame) -> pd.DataFrame:
-    # per predicate
-    df['n_workers'] = df.groupby('key').worker_id.transform(pd.Series.nunique)
+    _set_n_workers(df, *_get_predicate_and_assignment_codes(df))
     return df
 
 
 def set_n_roles(df: pd.DataFrame) -> pd.DataFrame:
-    # per predicate per worker
-    df['no_roles'] = df.groupby(['key', 'worker_id']).wh.transform(lambda x: x.isnull().sum())
-    df['num_rows'] = df.groupby(['key', 'worker_id']).wh.transform(pd.Series.count)
-    df['n_roles'] = df.apply(lambda r: r['num_rows']-r['no_roles'], axis=1)
-    df = df.drop('num_rows', axis=1)
+    _set_n_roles(df, _get_predicate_and_assignment_codes(df)[1])
     return df
 
 
 def set_n_roles_per_predicate(df: pd.DataFrame) -> pd.DataFrame:
     # per predicate, count roles joint from all workers
-    df['no_roles'] = df.groupby('key').wh.transform(lambda x: utils.is_empty_string_series(x).sum())
-    df['num_rows'] = df.groupby('key').wh.transform(pd.Series.count)
-    df['n_roles'] = df.apply(lambda r: r['num_rows']-r['no_roles'], axis=1)
-    df = df.drop(['num_rows'], axis=1)
+    key_codes, _ = pd.factorize(df['key'])
+    df['no_roles'] = _count_per_group(key_codes, utils.is_empty_string_series(df.wh).to_numpy())
+    num_rows = _count_per_group(key_codes, df.wh.notnull().to_numpy())
+    df['n_roles'] = pd.to_numeric(num_rows - df['no_roles'], downcast='integer')
     return df
 
 
@@ -133,9 +231,9 @@ def get_n_positive_predicates(annot_df: pd.DataFrame) -> int:
     # gets a df of annotation, returns number of assignments where isVerbal==True.
     # for a single worker df, this is the number of positive predicates.
     # for a multi-worker annot-df, this should be divided by num of assignments to get the positive rate.
-    reduced_df = annot_df.drop_duplicates(subset=["key", "worker_id"])
-    n_positive_predicates = reduced_df.is_verbal.sum()
-    return n_positive_predicates
+    # is_verbal is fixed per assignment (predicate X worker)
+    is_verbal_per_assignment = annot_df.groupby(["key", "worker_id"], sort=False, observed=True).is_verbal.any()
+    return int(is_verbal_per_assignment.sum())
 
 
 def get_n_QAs(annot_df: pd.DataFrame) -> int:
@@ -108,8 +108,8 @@ def yield_paired_predicates(sys_df: pd.DataFrame, grt_df: pd.DataFrame) -> Gener
     # Include only those predicates which are both in grt and in sys
     predicate_ids = pd.merge(grt_predicate_ids, sys_predicate_ids, how='inner')
     for idx, row in predicate_ids.iterrows():
-        sys_qa_pairs = sys_df[filter_ids(sys_df, row)].copy()
-        grt_qa_pairs = grt_df[filter_ids(grt_df, row)].copy()
+        sys_qa_pairs = sys_df[filter_ids(sys_df, row)]
+        grt_qa_pairs = grt_df[filter_ids(grt_df, row)]
         sys_response = decode_response(sys_qa_pairs)
         grt_response = decode_response(grt_qa_pairs)
         yield (row.qasrl_id, row.target_idx), sys_response, grt_response
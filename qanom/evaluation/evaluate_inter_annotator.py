@@ -1,12 +1,12 @@
 from argparse import ArgumentParser
-from collections import defaultdict
-from itertools import combinations, permutations
-from typing import Dict, Any
+from collections import defaultdict, Counter
+from itertools import combinations
+from typing import Dict, Any, Tuple, Optional, List
 
 import pandas as pd
 
-from qanom.annotations.common import read_annot_csv, set_key_column, get_n_predicates, get_predicate_idx_label
-from qanom.annotations.decode_encode_answers import decode_qasrl
+from qanom.annotations.common import read_annot_csv, set_key_column, get_n_predicates, \
+    get_sent_map, load_annotations
 from qanom.evaluation.evaluate import eval_datasets
 from qanom.evaluation.metrics import Metrics, BinaryClassificationMetrics
 
@@ -14,7 +14,7 @@ from qanom.evaluation.metrics import Metrics, BinaryClassificationMetrics
 # describe statistics of the saved annotated data
 def get_worker_statistics(annot_df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
     set_key_column(annot_df)
-    by_worker = annot_df.groupby("worker_id")
+    by_worker = annot_df.groupby("worker_id", observed=True)
     num_of_predicates = by_worker.key.nunique()
     num_of_qas = by_worker.question.count() # counts only non-NA values
     workers = list(num_of_predicates.index)
@@ -26,61 +26,127 @@ def get_worker_statistics(annot_df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
 def get_worker_statistics_from_file(anot_fn):
     return get_worker_statistics(read_annot_csv(anot_fn))
 
+
+def get_worker_dfs(annot_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """ Partition `annot_df` by worker in a single groupby pass (order of first appearance).
+     The sub-DataFrames are not copied - `eval_datasets` and the statistics functions only read them. """
+    return {worker: worker_df
+            for worker, worker_df in annot_df.groupby("worker_id", sort=False, observed=True)}
+
+
+def get_annotation_context(annot_df: pd.DataFrame) -> Dict[str, Any]:
+    """ Compute once the dataset-level information required by the evaluation functions below,
+     so that it can be shared among them (see their `ctx` argument).
+     'pair_cache' memoizes the pairwise `eval_datasets` results, and is thus bound to this `annot_df`.
+     Per-worker statistics are only needed by `evaluate_per_worker_iaa`, so they are added lazily (see
+     `get_ctx_worker_statistics`). """
+    return {"sent_map": get_sent_map(annot_df),
+            "n_predicates": get_n_predicates(annot_df),
+            "worker_dfs": get_worker_dfs(annot_df),
+            "pair_cache": {}}
+
+
+def get_ctx_worker_statistics(annot_df: pd.DataFrame, ctx: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """ Return `get_worker_statistics(annot_df)`, computing it only on first use within `ctx`. """
+    if "worker_stats" not in ctx:
+        ctx["worker_stats"] = get_worker_statistics(annot_df)
+    return ctx["worker_stats"]
+
+
+# maps an ordered (system-worker, reference-worker) pair to its `eval_datasets` result
+PairCache = Dict[Tuple[str, str], tuple]
+
+
+def eval_worker_pairs(worker_dfs: Dict[str, pd.DataFrame], pairs: List[Tuple[str, str]],
+                      sent_map: Optional[Dict[str, List[str]]] = None,
+                      pair_cache: Optional[PairCache] = None, n_jobs: int = 1) -> List[tuple]:
+    """
+    Return `eval_datasets` of w1 (as system) against w2 (as reference) for each (w1, w2) pair in `pairs`.
+    Pairs which are not yet in `pair_cache` are independent, and are evaluated with `n_jobs` worker processes
+    (using joblib; `n_jobs=-1` uses all cores). New results are stored in `pair_cache`, which must therefore
+    only be shared among calls over the same `worker_dfs` (see `get_annotation_context`).
+    """
+    pair_cache = {} if pair_cache is None else pair_cache
+    missing_pairs = [pair for pair in pairs if pair not in pair_cache]
+    if n_jobs == 1:
+        results = [eval_datasets(worker_dfs[w1], worker_dfs[w2], sent_map) for w1, w2 in missing_pairs]
+    else:
+        from joblib import Parallel, delayed
+        # send each task only the sentences shared by both workers (the only ones `eval_datasets` looks up),
+        # rather than pickling the whole `sent_map` for every pair
+        worker_sentences = {worker: set(worker_df.qasrl_id) for worker, worker_df in worker_dfs.items()}
+
+        def pair_sent_map(w1: str, w2: str) -> Optional[Dict[str, List[str]]]:
+            if sent_map is None:
+                return None
+            return {qasrl_id: sent_map[qasrl_id] for qasrl_id in worker_sentences[w1] & worker_sentences[w2]}
+
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(eval_datasets)(worker_dfs[w1], worker_dfs[w2], pair_sent_map(w1, w2))
+            for w1, w2 in missing_pairs)
+    pair_cache.update(zip(missing_pairs, results))
+    return [pair_cache[pair] for pair in pairs]
+
 """ Analysis functions"""
 
 
 def describe_worker_work(annot_df: pd.DataFrame):
-    from annotations.analyze import print_annot_statistics
+    from qanom.annotations.analyze import print_annot_statistics, get_role_distribution_per_worker
 
-    workers = annot_df.worker_id.unique().tolist()
-    agreement_stats = evaluate_per_worker_iaa(annot_df, isPrinting=False)
-    general_worker_stats = get_worker_statistics(annot_df)
-    for worker in workers:
+    ctx = get_annotation_context(annot_df)
+    agreement_stats = evaluate_per_worker_iaa(annot_df, isPrinting=False, ctx=ctx)
+    role_dists = get_role_distribution_per_worker(annot_df)
+    for worker, worker_df in ctx["worker_dfs"].items():
         """ For each worker, present:
          - # predicates
          - # of predicates judged positive (as verbal nouns)
          - # distribution of #-roles per positive predicate
         """
         print(f"********** Worker {worker}: ************")
-        worker_df: pd.DataFrame = annot_df[annot_df.worker_id == worker]
-        print_annot_statistics(worker_df)
+        print_annot_statistics(worker_df, roleDist=role_dists.get(worker, Counter()))
         print(agreement_stats[worker])
     #  todo complete it with more info?
 
 
-def evaluate_per_worker_iaa(annot_df: pd.DataFrame, isPrinting=True):
-    workers = annot_df.worker_id.unique().tolist()
+def evaluate_per_worker_iaa(annot_df: pd.DataFrame, isPrinting=True, n_jobs: int = 1,
+                            ctx: Optional[Dict[str, Any]] = None):
+    ctx = ctx or get_annotation_context(annot_df)
+    worker_dfs = ctx["worker_dfs"]
+    workers = list(worker_dfs.keys())
     n_workers = len(workers)
-    n_predicates = get_n_predicates(annot_df)
+    n_predicates = ctx["n_predicates"]
     print("n_workers: ", n_workers)
     print("n_predicates: ", n_predicates)
 
     # save per worker a list of local 1:1 inter-annotator agreement and their weights (i.e. number of instances);
     arg_agreements = defaultdict(list)
     nom_ident_agreements = defaultdict(list)
-    # go through all pairs of workers - permutations (less efficient then combinations, but more readable)
-    for w1, w2 in permutations(workers, r=2):
-        w1_df = annot_df[annot_df.worker_id == w1].copy()
-        w2_df = annot_df[annot_df.worker_id == w2].copy()
-        # compute 1:1 agreements
-        arg_metrics, larg_metrics, role_metrics, nom_ident_metrics, matching_args = eval_datasets(w1_df, w2_df)
+    # go through all pairs of workers - each pair is evaluated once, and the reverse comparison (w2 as system,
+    # w1 as reference) is derived by transposing the metrics, i.e. swapping false-positives and false-negatives
+    pairs = list(combinations(workers, r=2))
+    # compute 1:1 agreements
+    pairs_results = eval_worker_pairs(worker_dfs, pairs, ctx["sent_map"], ctx["pair_cache"], n_jobs)
+    for (w1, w2), (arg_metrics, larg_metrics, role_metrics, nom_ident_metrics, matching_args) in zip(pairs, pairs_results):
         # Arg-Accuracy: metric is f1, weight is number of predicted arguments
         arg_agreements[w1].append(arg_metrics)
+        arg_agreements[w2].append(arg_metrics.transpose())
         # Nominalization-Identification Accuracy: metric is accuracy, weight is number of (common) predicates
         nom_ident_agreements[w1].append(nom_ident_metrics)
+        nom_ident_agreements[w2].append(nom_ident_metrics.transpose())
     # compute per worker personal performance, measured by IAA
     worker_arg_performance = {}
     for worker_id, lst_of_agreements in arg_agreements.items():
-        overallArgMetric : Metrics = sum(lst_of_agreements)
+        overallArgMetric : Metrics = Metrics.from_sum(lst_of_agreements)
         worker_arg_performance[worker_id] = overallArgMetric
     worker_isnom_performance = {}
     for worker_id, lst_of_accMetrics in nom_ident_agreements.items():
-        total_acc_metric : BinaryClassificationMetrics = sum(lst_of_accMetrics)
+        total_acc_metric : BinaryClassificationMetrics = BinaryClassificationMetrics.from_sum(lst_of_accMetrics)
         worker_isnom_performance[worker_id] = total_acc_metric
 
     # print and save statistics
     print(f"worker_id \t\t arg \t\t\t\t is_verbal")
-    worker_general_statistics = get_worker_statistics(annot_df)
+    # copy, as the statistics are updated below
+    worker_general_statistics = {worker_id: dict(statistics) for worker_id, statistics in get_ctx_worker_statistics(annot_df, ctx).items()}
     for worker_id, statistics in worker_general_statistics.items():
         if isPrinting:
             print(f"{worker_id} \t arg: {worker_arg_performance[worker_id]} " +
@@ -92,41 +158,41 @@ def evaluate_per_worker_iaa(annot_df: pd.DataFrame, isPrinting=True):
     return worker_general_statistics
 
 
-def evaluate_inter_generator_agreement(annot_df: pd.DataFrame, verbose: bool = False) -> float:
-    cols = ['qasrl_id', get_predicate_idx_label(annot_df)]
-    n_gen = annot_df.groupby(cols).worker_id.transform(pd.Series.nunique)
-    workers = annot_df.worker_id.unique().tolist()
+def evaluate_inter_generator_agreement(annot_df: pd.DataFrame, verbose: bool = False,
+                                       n_jobs: int = 1, ctx: Optional[Dict[str, Any]] = None) -> float:
+    ctx = ctx or get_annotation_context(annot_df)
+    worker_dfs = ctx["worker_dfs"]
+    workers = list(worker_dfs.keys())
     n_workers = len(workers)
-    annot_df = annot_df.copy()
-    n_predicates = annot_df[cols].drop_duplicates().shape[0]
+    n_predicates = ctx["n_predicates"]
     if verbose:
         print("n_workers: ", n_workers)
         print("n_predicates: ", n_predicates)
         print(f"metric\tworker_1\tworker_2\tprec\trecall\tf1")
 
-    total_arg_metric = Metrics.empty()
-    total_larg_metric = Metrics.empty()
-    total_role_metric = Metrics.empty()
-    total_nomIdent_metric : BinaryClassificationMetrics = BinaryClassificationMetrics.empty()
-    for w1, w2 in combinations(workers, r=2):
-        w1_df = annot_df[annot_df.worker_id == w1].copy()
-        w2_df = annot_df[annot_df.worker_id == w2].copy()
-        # compute agreement measures
-        arg_metrics, labeled_arg_metrics, role_metrics, nom_ident_metrics, _ = \
-            eval_datasets(w1_df, w2_df)
+    arg_metrics_lst, larg_metrics_lst, role_metrics_lst, nomIdent_metrics_lst = [], [], [], []
+    pairs = list(combinations(workers, r=2))
+    # compute agreement measures
+    pairs_results = eval_worker_pairs(worker_dfs, pairs, ctx["sent_map"], ctx["pair_cache"], n_jobs)
+    for (w1, w2), (arg_metrics, labeled_arg_metrics, role_metrics, nom_ident_metrics, _) in zip(pairs, pairs_results):
         if verbose:
             print(f"\nComparing  {w1}   to   {w2}:   [p,r,f1]")
-            merged_df = pd.merge(w1_df, w2_df, on='key')
+            merged_df = pd.merge(worker_dfs[w1], worker_dfs[w2], on='key')
             print(f"Number of shared predicates: {get_n_predicates(merged_df)}")
             print(f"ARG:\t{arg_metrics}")
             print(f"Labeled ARG:\t{labeled_arg_metrics}")
             print(f"ROLE:\t{role_metrics}")
             print(f"NOM_IDENT:\t{w1}\t{w2}\t{nom_ident_metrics.prec():.3f}\t{nom_ident_metrics.recall():.3f}\t{nom_ident_metrics.f1():.3f}")
             print(f"NOM_IDENT accuracy: {nom_ident_metrics.accuracy():.3f}, {int(nom_ident_metrics.errors())} mismathces out of {nom_ident_metrics.instances()} predicates.")
-        total_arg_metric += arg_metrics
-        total_larg_metric += labeled_arg_metrics
-        total_role_metric += role_metrics
-        total_nomIdent_metric += nom_ident_metrics
+        arg_metrics_lst.append(arg_metrics)
+        larg_metrics_lst.append(labeled_arg_metrics)
+        role_metrics_lst.append(role_metrics)
+        nomIdent_metrics_lst.append(nom_ident_metrics)
+
+    total_arg_metric = Metrics.from_sum(arg_metrics_lst)
+    total_larg_metric = Metrics.from_sum(larg_metrics_lst)
+    total_role_metric = Metrics.from_sum(role_metrics_lst)
+    total_nomIdent_metric : BinaryClassificationMetrics = BinaryClassificationMetrics.from_sum(nomIdent_metrics_lst)
 
     print(f"\nOverall pairwise agreement:")
     print(f"arg-f1 \t {total_arg_metric.f1():.4f}")
@@ -136,22 +202,27 @@ def evaluate_inter_generator_agreement(annot_df: pd.DataFrame, verbose: bool = F
     return total_arg_metric.f1()
 
 
-def main(annotation_path: str):
-    annot_df = read_annot_csv(annotation_path)
-    annot_df = decode_qasrl(annot_df)
+def main(annotation_path: str, n_jobs: int = 1, use_cache: bool = False):
+    annot_df = load_annotations(annotation_path, use_cache)
     # original annotations, multiple generation tasks per predicate
     print(annot_df.worker_id.value_counts())
-    evaluate_inter_generator_agreement(annot_df, verbose=True)
+    # both evaluations go through the same worker pairs - sharing `ctx` (and its 'pair_cache') evaluates each pair once
+    ctx = get_annotation_context(annot_df)
+    evaluate_inter_generator_agreement(annot_df, verbose=True, n_jobs=n_jobs, ctx=ctx)
+    evaluate_per_worker_iaa(annot_df, n_jobs=n_jobs, ctx=ctx)
 
-def main_iaa_per_worker(annotation_path: str):
-    annot_df = read_annot_csv(annotation_path)
-    annot_df = decode_qasrl(annot_df)
+def main_iaa_per_worker(annotation_path: str, n_jobs: int = 1, use_cache: bool = False):
+    annot_df = load_annotations(annotation_path, use_cache)
     print(annot_df.worker_id.value_counts())
-    evaluate_per_worker_iaa(annot_df)
+    evaluate_per_worker_iaa(annot_df, n_jobs=n_jobs)
 
 if __name__ == "__main__":
     ap = ArgumentParser()
     ap.add_argument("annotation_path")
+    ap.add_argument("--n_jobs", type=int, default=1,
+                    help="number of processes for evaluating worker pairs (-1 for all cores)")
+    ap.add_argument("--cache", action="store_true",
+                    help="cache the decoded annotations next to the CSV (<annotation_path>.v<version>.pkl) and re-use it")
     args = ap.parse_args()
-    main(args.annotation_path)
+    main(args.annotation_path, args.n_jobs, use_cache=args.cache)
 
@@ -1,6 +1,6 @@
 from dataclasses import dataclass, astuple
 from itertools import combinations
-from typing import List
+from typing import List, Iterable
 
 import numpy as np
 
@@ -9,6 +9,14 @@ from qanom.annotations.decode_encode_answers import Argument, Role
 MATCH_IOU_THRESHOLD = 0.3
 
 
+def _from_sum(cls, metrics: Iterable):
+    """ Sum many Metrics (of type `cls`) at once by a field-wise numpy reduction (instead of pairwise `__add__`). """
+    counts = np.array([astuple(m) for m in metrics])
+    if not len(counts):
+        return cls.empty()
+    return cls(*map(int, counts.sum(axis=0)))
+
+
 @dataclass
 class Metrics:
     true_positive: int
@@ -53,6 +61,10 @@ class Metrics:
         """ Return the tuple representation of this Metrics as numpy array. """
         return np.array(astuple(self))
 
+    def transpose(self) -> 'Metrics':
+        """ Return the Metrics of the reverse comparison, i.e. with system and ground-truth swapped. """
+        return Metrics(self.true_positive, self.false_negative, self.false_positive)
+
     """ Operators """
     def __add__(self, other):
         if other == 0:
@@ -74,6 +86,8 @@ class Metrics:
     def empty(cls):
         return Metrics(0,0,0)
 
+    from_sum = classmethod(_from_sum)
+
 
 @dataclass
 class BinaryClassificationMetrics:
@@ -124,6 +138,11 @@ class BinaryClassificationMetrics:
         """ Return the tuple representation of this Metrics as numpy array. """
         return np.array(astuple(self))
 
+    def transpose(self) -> 'BinaryClassificationMetrics':
+        """ Return the Metrics of the reverse comparison, i.e. with system and ground-truth swapped. """
+        return BinaryClassificationMetrics(self.true_positive, self.true_negative,
+                                           self.false_negative, self.false_positive)
+
     """ Operators """
     def __add__(self, other):
         if other == 0:
@@ -145,6 +164,8 @@ class BinaryClassificationMetrics:
     def empty(cls):
         return BinaryClassificationMetrics(0,0,0,0)
 
+    from_sum = classmethod(_from_sum)
+
     @classmethod
     def simple_boolean_decision(cls, sys_decision: bool, grt_decision: bool):
         tp = int(sys_decision and grt_decision)
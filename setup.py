@@ -22,6 +22,7 @@ setuptools.setup(
         'nltk',
         'pandas',
         'tqdm',
+        'joblib', # for parallel pairwise evaluation in `evaluate_inter_annotator`
         'scikit-learn',
         'constrained_decoding', # for `dfa_fill_qasrl_slots` used in `QASRL_Pipeline`
     ],